@@ -1,11 +1,85 @@
-from flask import Flask, render_template, request, jsonify, send_file
-from datetime import datetime, timedelta
-import os
+from flask import Flask, render_template, request, jsonify, send_file, Response, stream_with_context
+from datetime import datetime, timedelta, date
+import io
+import json
+import threading
+import time
+import uuid
 from calendar_fetcher import CalendarFetcher
 from pdf_generator import PDFGenerator
+from offload import run_cpu_bound
 
 app = Flask(__name__)
 
+# in-process registry of background generation jobs:
+# job_id -> {'status': latest status update, 'changed': Condition notified on each update,
+#            'pdf': bytes, 'filename': str, 'created': epoch seconds}
+_JOBS = {}
+_JOBS_LOCK = threading.Lock()
+_JOB_TTL = 600  # seconds an unclaimed job (and its PDF) is kept
+_SSE_HEARTBEAT = 30  # seconds between keep-alive comments on the progress stream
+
+def _purge_expired_jobs():
+    cutoff = time.time() - _JOB_TTL
+    with _JOBS_LOCK:
+        for job_id in [job_id for job_id, job in _JOBS.items() if job['created'] < cutoff]:
+            del _JOBS[job_id]
+
+def _set_status(job, update):
+    """Record a job's latest status and wake every stream following it"""
+    with job['changed']:
+        job['status'] = update
+        job['changed'].notify_all()
+
+def _run_job(job_id, job, ical_urls, timezone, start_date, end_date, start_hour, end_hour, show_todos):
+    """Fetch events and render the PDF, reporting progress through the job's status"""
+    try:
+        # fetch calendar events with timezone
+        _set_status(job, {'status': 'fetching'})
+        fetcher = CalendarFetcher(ical_urls, timezone)
+        events = fetcher.fetch_events(start_date, end_date)
+
+        # render straight into memory; nothing touches the disk. Rendering is
+        # CPU-bound, so under gevent it runs on a real thread
+        _set_status(job, {'status': 'generating'})
+        buffer = io.BytesIO()
+        generator = PDFGenerator()
+        run_cpu_bound(generator.generate_pdf, start_date, end_date, events, buffer, start_hour, end_hour, show_todos)
+
+        job['pdf'] = buffer.getvalue()
+        _set_status(job, {'status': 'done', 'url': f'/download/{job_id}'})
+    except Exception as e:
+        _set_status(job, {'status': 'error', 'error': 'An error occurred generating the calendar'})
+
+def _sse_stream(job_id, job):
+    """Relay a job's status as server-sent events until it finishes.
+
+    Every stream starts from the latest status, so a reload or reconnect after
+    the job finished gets the final update straight away instead of waiting.
+    """
+    last = None
+    while True:
+        with job['changed']:
+            if job['status'] is last:
+                job['changed'].wait(timeout=_SSE_HEARTBEAT)
+            update = job['status']
+
+        if update is last:
+            with _JOBS_LOCK:
+                expired = job_id not in _JOBS
+            if expired:
+                return
+            # comment line keeps proxies from closing an idle connection
+            yield ': keep-alive\n\n'
+            continue
+
+        last = update
+
+        yield f"data: {json.dumps(update)}\n\n"
+        if update['status'] in ('done', 'error'):
+            # failed jobs hold no PDF; they stay replayable until purged
+            return
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -40,7 +114,10 @@ def generate_calendar():
 
         # parse start date or default to next Monday
         if start_date_str:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+            try:
+                start_date = date.fromisoformat(start_date_str)
+            except ValueError:
+                return jsonify({'error': 'Start date must be in YYYY-MM-DD format'}), 400
         else:
             today = datetime.now().date()
             days_ahead = 0 - today.weekday()  # Monday is 0
@@ -50,7 +127,10 @@ def generate_calendar():
 
         # parse end date or default to 7 days from start (minus 1 to make it inclusive)
         if end_date_str:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
+            try:
+                end_date = date.fromisoformat(end_date_str)
+            except ValueError:
+                return jsonify({'error': 'End date must be in YYYY-MM-DD format'}), 400
         else:
             end_date = start_date + timedelta(days=6)  # 7 days total (inclusive)
 
@@ -58,11 +138,6 @@ def generate_calendar():
         if end_date < start_date:
             return jsonify({'error': 'End date must be on or after start date'}), 400
 
-        # fetch calendar events with timezone
-        fetcher = CalendarFetcher(ical_urls, timezone)
-        events = fetcher.fetch_events(start_date, end_date)
-
-
         # generate filename based on date range
         if start_date == end_date:
             # single day: just month-day
@@ -70,27 +145,49 @@ def generate_calendar():
         else:
             # date range: month-day to month-day
             filename = f"{start_date.month}-{start_date.day}-to-{end_date.month}-{end_date.day}.pdf"
-        output_path = os.path.join('output', filename)
-        os.makedirs('output', exist_ok=True)
 
-        generator = PDFGenerator()
-        generator.generate_pdf(start_date, end_date, events, output_path, start_hour, end_hour, show_todos)
-
-        # return the PDF file directly for download and remove from server
-        try:
-            response = send_file(output_path, as_attachment=True, download_name=filename)
-            # delete the file after sending
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            return response
-        except Exception as e:
-            # clean up file if send fails
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            raise e
+        # hand the slow part to a background thread and return right away;
+        # the client follows /progress/<job_id> and then fetches /download/<job_id>
+        _purge_expired_jobs()
+        job_id = uuid.uuid4().hex
+        job = {'status': None, 'changed': threading.Condition(), 'pdf': None, 'filename': filename, 'created': time.time()}
+        with _JOBS_LOCK:
+            _JOBS[job_id] = job
+
+        threading.Thread(
+            target=_run_job,
+            args=(job_id, job, ical_urls, timezone, start_date, end_date, start_hour, end_hour, show_todos),
+            daemon=True
+        ).start()
+
+        return jsonify({'job_id': job_id}), 202
 
     except Exception as e:
         return jsonify({'error': 'An error occurred generating the calendar'}), 500
 
+@app.route('/progress/<job_id>')
+def job_progress(job_id):
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+
+    response = Response(stream_with_context(_sse_stream(job_id, job)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+@app.route('/download/<job_id>')
+def download_pdf(job_id):
+    # a finished PDF can be downloaded once, then it's gone
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job is None or job['pdf'] is None:
+            return jsonify({'error': 'Unknown or unfinished job'}), 404
+        del _JOBS[job_id]
+
+    return send_file(io.BytesIO(job['pdf']), mimetype='application/pdf', as_attachment=True, download_name=job['filename'])
+
 if __name__ == '__main__':
+    # development server only; production runs `gunicorn app:app` (see gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
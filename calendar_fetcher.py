@@ -1,17 +1,81 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from icalendar import Calendar
-from datetime import datetime, timedelta, date
-import pytz
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+from datetime import datetime, timedelta, date, time
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from dateutil import rrule
 from dateutil.rrule import rrulestr
+from offload import run_cpu_bound
+
+# module-level session so TCP/TLS connections are reused across feeds and requests
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                       max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]))
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# in-memory LRU of indexed feeds for conditional GETs: url -> (etag, last_modified, singles, recurring)
+_FEED_CACHE_SIZE = 64
+_feed_cache = OrderedDict()
+_feed_cache_lock = threading.Lock()
+
+def _get_cached_feed(url):
+    with _feed_cache_lock:
+        entry = _feed_cache.get(url)
+        if entry:
+            _feed_cache.move_to_end(url)
+        return entry
+
+def _store_cached_feed(url, entry):
+    with _feed_cache_lock:
+        _feed_cache[url] = entry
+        _feed_cache.move_to_end(url)
+        while len(_feed_cache) > _FEED_CACHE_SIZE:
+            _feed_cache.popitem(last=False)
+
+# resolved zones by name, seeded with the common ones. Only names that resolve
+# are added, so the cache is bounded by the tz database rather than user input
+_TZ_CACHE = {name: ZoneInfo(name) for name in (
+    'America/New_York', 'America/Chicago', 'America/Denver', 'America/Los_Angeles', 'UTC'
+)}
+_UTC = _TZ_CACHE['UTC']
+
+# fallback when the browser sends a timezone we can't resolve
+DEFAULT_TIMEZONE = 'America/Chicago'
+_DEFAULT_TZ = _TZ_CACHE[DEFAULT_TIMEZONE]
+
+# how far an event's date in its own timezone can be from its local date
+# (UTC offsets span -12h to +14h)
+_TZ_SLACK = timedelta(days=2)
+
+def _resolve_timezone(name):
+    tz = _TZ_CACHE.get(name)
+    if tz is None:
+        try:
+            tz = ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError, OSError):
+            # unknown, malformed, a tzdata directory (e.g. "America") or too long
+            return _DEFAULT_TZ
+        _TZ_CACHE[name] = tz
+    return tz
+
+def _sort_key(event):
+    """Order by local date, then local time; all-day events sort as midnight.
+    Everything is already in the local timezone, so this never touches tzinfo
+    (.time() returns a naive time)."""
+    start = event['start']
+    if isinstance(start, datetime):
+        return (start.date(), start.time())
+    return (start, time.min)
 
 class CalendarFetcher:
-    def __init__(self, urls, timezone='America/Chicago'):
+    def __init__(self, urls, timezone=DEFAULT_TIMEZONE):
         self.urls = [url.strip() for url in urls.split(',') if url.strip()]
-        try:
-            self.local_tz = pytz.timezone(timezone)
-        except:
-            self.local_tz = pytz.timezone('America/Chicago')
+        self.local_tz = _resolve_timezone(timezone)
 
     def fetch_events(self, start_date, end_date):
         """
@@ -27,206 +91,282 @@ class CalendarFetcher:
         """
         all_events = []
 
-        for url in self.urls:
-            try:
-                # try to force fresh data from ICS
-                import time
-                cache_buster = int(time.time())
-                url_with_cache_buster = f"{url}&_cb={cache_buster}" if '?' in url else f"{url}?_cb={cache_buster}"
-
-                response = requests.get(url_with_cache_buster, timeout=30, headers={
-                    'Cache-Control': 'no-cache',
-                    'Pragma': 'no-cache'
-                })
-                response.raise_for_status()
-
-                cal = Calendar.from_ical(response.content)
-
-                for component in cal.walk():
-                    if component.name == "VEVENT":
-                        # check for recurring events
-                        if component.get('RRULE'):
-                            recurring_events = self._parse_recurring_event(component, start_date, end_date)
-                            all_events.extend(recurring_events)
-                        else:
-                            # single event
-                            event = self._parse_event(component, start_date, end_date)
-                            if event:
-                                all_events.append(event)
-
-            except Exception as e:
-                continue
+        if self.urls:
+            # fetch feeds concurrently; total time is the slowest feed, not the sum
+            with ThreadPoolExecutor(max_workers=min(8, len(self.urls))) as executor:
+                futures = [executor.submit(self._fetch_one, url, start_date, end_date) for url in self.urls]
+                # collect in submission order so event ordering stays stable between runs
+                for future in futures:
+                    all_events.extend(future.result() or [])
 
-        # sort events, handling both date and datetime objects
-        def sort_key(event):
-            start = event['start']
-            if isinstance(start, datetime):
-                # ensure datetime is timezone-aware
-                if start.tzinfo is None:
-                    return self.local_tz.localize(start)
-                return start
-            else:
-                # convert date to timezone-aware datetime for sorting purposes only
-                dt = datetime.combine(start, datetime.min.time())
-                return self.local_tz.localize(dt)
+        all_events.sort(key=_sort_key)
+        return all_events
 
-        return sorted(all_events, key=sort_key)
+    def _fetch_one(self, url, start_date, end_date):
+        """Fetch a single iCal feed and return its events within the date range"""
+        events = []
 
-    def _parse_event(self, event, start_date, end_date):
-        """Parse individual event and return formatted dict if in date range"""
         try:
-            dtstart = event.get('dtstart')
-            dtend = event.get('dtend')
-            summary = event.get('summary')
-
-
-            if not dtstart or not summary:
-                return None
-
-            # handle different datetime formats
-            start_dt = dtstart.dt
-
-            if isinstance(start_dt, datetime):
-                # convert to local timezone if needed
-                if start_dt.tzinfo is None:
-                    start_dt = start_dt.replace(tzinfo=pytz.UTC)
-                start_dt = start_dt.astimezone(self.local_tz)
-            else:
-                # all-day event - keep as date object
-                pass
-
-            # check if event is in our date range
-            event_date = start_dt.date() if isinstance(start_dt, datetime) else start_dt
-            if not (start_date <= event_date <= end_date):
-                return None
-
-            end_dt = None
-            if dtend:
-                end_dt = dtend.dt
-                if isinstance(end_dt, datetime):
-                    if end_dt.tzinfo is None:
-                        end_dt = end_dt.replace(tzinfo=pytz.UTC)
-                    end_dt = end_dt.astimezone(self.local_tz)
-                else:
-                    # for all-day events, keep end as date object too
-                    pass  # keep as date
-
-            result = {
-                'start': start_dt,
-                'end': end_dt,
-                'title': str(summary),
-                'date': event_date.strftime('%Y-%m-%d')
+            # revalidate against the server instead of busting caches, so an
+            # unchanged feed comes back as an empty 304 and skips parsing
+            headers = {
+                'Cache-Control': 'no-cache',
+                'Pragma': 'no-cache'
             }
-            return result
+            cached = _get_cached_feed(url)
+            if cached:
+                etag, last_modified, _, _ = cached
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+
+            # stream so a 304 or error status is never buffered, and release the
+            # connection back to the pool before the (slow) parse starts
+            body = None
+            with _SESSION.get(url, timeout=30, headers=headers, stream=True) as response:
+                if response.status_code == 304 and cached:
+                    _, _, singles, recurring = cached
+                else:
+                    response.raise_for_status()
+                    body = response.content
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+
+            if body is not None:
+                # hand icalendar the raw bytes; it decodes them as UTF-8 itself,
+                # while response.text would guess a charset first. Parsing a
+                # large feed is CPU-bound, so keep it off the gevent hub
+                cal = run_cpu_bound(Calendar.from_ical, body)
+                body = None
+                singles, recurring = run_cpu_bound(self._index_calendar, cal)
+
+                if etag or last_modified:
+                    _store_cached_feed(url, (etag, last_modified, singles, recurring))
+
+            for item in singles:
+                event = self._parse_event(item, start_date, end_date)
+                if event:
+                    events.append(event)
+
+            for item in recurring:
+                events.extend(self._parse_recurring_event(item, start_date, end_date))
 
         except Exception as e:
-            return None
-
-    def _parse_recurring_event(self, event, start_date, end_date):
-        """Parse recurring event and expand occurrences within date range"""
-        recurring_events = []
-
-        try:
-            dtstart = event.get('dtstart')
-            dtend = event.get('dtend')
-            summary = event.get('summary')
-            rrule_data = event.get('RRULE')
-
-
-            if not dtstart or not summary or not rrule_data:
-                return []
+            return []
 
-            # get the start datetime
-            start_dt = dtstart.dt
+        return events
 
-            # calculate duration if end time exists
-            duration = None
-            if dtend:
-                end_dt = dtend.dt
-                if isinstance(start_dt, datetime) and isinstance(end_dt, datetime):
-                    duration = end_dt - start_dt
-                elif isinstance(start_dt, date) and isinstance(end_dt, date):
-                    duration = end_dt - start_dt
-
-            # convert vRecur to string format
-            rrule_str = rrule_data.to_ical().decode('utf-8')
-
-            # handle timezone
-            is_all_day = not isinstance(start_dt, datetime)
-            original_start_dt = start_dt  # keep original for later
+    def _index_calendar(self, cal):
+        """
+        Walk a parsed calendar once and split its VEVENTs into single and
+        recurring items. Items don't depend on the requested range or timezone,
+        so they can be cached and filtered cheaply on later requests:
+        {
+            'start': datetime (tz-aware) or date,
+            'end': datetime (tz-aware), date or None,
+            'title': 'Event Title',
+            'rrule': 'FREQ=...' (recurring only),
+            'duration': timedelta or None (recurring only),
+            'rules': {timezone name: compiled rrule} (recurring only),
+            'until': date the series ends or None (recurring only),
+            'daily_interval': INTERVAL of an open-ended FREQ=DAILY rule or None (recurring only)
+        }
+        """
+        singles = []
+        recurring = []
 
-            if isinstance(start_dt, datetime):
-                if start_dt.tzinfo is None:
-                    start_dt = start_dt.replace(tzinfo=pytz.UTC)
-                start_dt = start_dt.astimezone(self.local_tz)
-            else:
-                # for all-day events, we need to temporarily convert to datetime for rrule
-                # but keep the original date
-                start_dt_for_rrule = datetime.combine(start_dt, datetime.min.time())
-                start_dt_for_rrule = start_dt_for_rrule.replace(tzinfo=self.local_tz)
+        # VEVENTs are always direct children of VCALENDAR, so there's no need to
+        # recurse into VTIMEZONE/VALARM subtrees the way walk() does
+        for component in cal.subcomponents:
+            if component.name != "VEVENT":
+                continue
 
-            # create rrule object
             try:
-                # parse the RRULE
-                if is_all_day:
-                    rule = rrulestr(rrule_str, dtstart=start_dt_for_rrule)
+                dtstart = component.get('dtstart')
+                dtend = component.get('dtend')
+                summary = component.get('summary')
+                rrule_data = component.get('RRULE')
+
+                if not dtstart or not summary:
+                    continue
+
+                start_dt = dtstart.dt
+                end_dt = dtend.dt if dtend else None
+
+                item = {
+                    'start': self._with_default_tz(start_dt),
+                    'end': self._with_default_tz(end_dt),
+                    'title': str(summary)
+                }
+
+                if rrule_data:
+                    # calculate duration from the raw values if end time exists
+                    duration = None
+                    if end_dt is not None:
+                        if isinstance(start_dt, datetime) and isinstance(end_dt, datetime):
+                            duration = end_dt - start_dt
+                        elif isinstance(start_dt, date) and isinstance(end_dt, date):
+                            duration = end_dt - start_dt
+
+                    # convert vRecur to string format
+                    item['rrule'] = rrule_data.to_ical().decode('utf-8')
+                    item['duration'] = duration
+                    item['rules'] = {}
+
+                    # bounds used to skip or shorten expansion for a given window
+                    until = rrule_data.get('UNTIL')
+                    until = until[0] if until else None
+                    item['until'] = until.date() if isinstance(until, datetime) else until
+
+                    item['daily_interval'] = None
+                    if rrule_data.get('FREQ') == ['DAILY'] and not rrule_data.get('COUNT'):
+                        interval = rrule_data.get('INTERVAL')
+                        item['daily_interval'] = int(interval[0]) if interval else 1
+                    recurring.append(item)
                 else:
-                    rule = rrulestr(rrule_str, dtstart=start_dt)
-
-                # generate occurrences within our date range
-                # always use datetime for search range with rrule
-                search_start = datetime.combine(start_date, datetime.min.time())
-                search_end = datetime.combine(end_date, datetime.max.time())
-
-                # make search dates timezone-aware with local timezone
-                search_start = self.local_tz.localize(search_start)
-                search_end = self.local_tz.localize(search_end)
+                    singles.append(item)
 
+            except Exception as e:
+                continue
 
-                # get occurrences
-                occurrences = list(rule.between(search_start, search_end, inc=True))
+        return singles, recurring
 
-                # for all-day events, convert occurrences back to dates
-                if is_all_day:
-                    occurrences = [occ.date() if isinstance(occ, datetime) else occ for occ in occurrences]
+    def _with_default_tz(self, value):
+        """Treat naive datetimes as UTC; dates and None pass through unchanged"""
+        if isinstance(value, datetime) and value.tzinfo is None:
+            return value.replace(tzinfo=_UTC)
+        return value
 
+    def _parse_event(self, event, start_date, end_date):
+        """Localize an indexed event and return formatted dict if in date range"""
+        start_dt = event['start']
+
+        if isinstance(start_dt, datetime):
+            # cheap check on the event's own date first, so events far outside
+            # the window are dropped without any timezone conversion
+            approx_date = start_dt.date()
+            if not (start_date - _TZ_SLACK <= approx_date <= end_date + _TZ_SLACK):
+                return None
 
-                for occurrence in occurrences:
-                    # create event for this occurrence
-                    if isinstance(occurrence, datetime):
-                        event_date = occurrence.date()
-                    else:
-                        event_date = occurrence
+            # convert to local timezone; a date at the edge of the datetime
+            # range can overflow once shifted, so drop just that event
+            try:
+                start_dt = start_dt.astimezone(self.local_tz)
+            except (OverflowError, ValueError):
+                return None
+            event_date = start_dt.date()
+        else:
+            # all-day event - keep as date object
+            event_date = start_dt
 
+        # check if event is in our date range before touching the end time
+        if not (start_date <= event_date <= end_date):
+            return None
 
-                    # skip if outside our actual date range
-                    if not (start_date <= event_date <= end_date):
-                        continue
+        end_dt = event['end']
+        if isinstance(end_dt, datetime):
+            try:
+                end_dt = end_dt.astimezone(self.local_tz)
+            except (OverflowError, ValueError):
+                return None
+        else:
+            # for all-day events, keep end as date object too
+            pass  # keep as date
+
+        result = {
+            'start': start_dt,
+            'end': end_dt,
+            'title': event['title'],
+            'date': event_date.isoformat()
+        }
+        return result
 
-                    end_time = None
-                    if duration:
-                        if isinstance(occurrence, datetime):
-                            end_time = occurrence + duration
-                        else:
-                            # for date objects, duration should be in days
-                            end_time = occurrence + duration if isinstance(duration, timedelta) else None
+    def _parse_recurring_event(self, event, start_date, end_date):
+        """Expand an indexed recurring event into occurrences within date range"""
+        recurring_events = []
 
-                    recurring_events.append({
-                        'start': occurrence,
-                        'end': end_time,
-                        'title': str(summary),
-                        'date': event_date.strftime('%Y-%m-%d')
-                    })
+        start_dt = event['start']
+        duration = event['duration']
+        is_all_day = not isinstance(start_dt, datetime)
+
+        # nothing to expand if the series starts after the window or ends before it
+        # (with slack since these dates aren't in the local timezone yet)
+        first_date = start_dt if is_all_day else start_dt.date()
+        if first_date > end_date + _TZ_SLACK:
+            return []
+        if event['until'] and event['until'] < start_date - _TZ_SLACK:
+            return []
+
+        if is_all_day:
+            # for all-day events, we need to temporarily convert to datetime for rrule
+            # but keep the original date
+            start_dt_for_rrule = datetime.combine(start_dt, datetime.min.time())
+            start_dt_for_rrule = start_dt_for_rrule.replace(tzinfo=self.local_tz)
+        else:
+            try:
+                start_dt_for_rrule = start_dt.astimezone(self.local_tz)
+            except (OverflowError, ValueError):
+                return []
 
+        # generate occurrences within our date range
+        # always use datetime for search range with rrule, in the local timezone
+        search_start = datetime.combine(start_date, datetime.min.time()).replace(tzinfo=self.local_tz)
+        search_end = datetime.combine(end_date, datetime.max.time()).replace(tzinfo=self.local_tz)
 
-            except Exception as e:
-                pass
-                # fall back to single event
-                single_event = self._parse_event(event, start_date, end_date)
-                if single_event:
-                    return [single_event]
+        # an RRULE dateutil can't handle is the one genuinely unpredictable step,
+        # so it's the only part guarded by exception handling
+        try:
+            # compile the RRULE once per timezone and keep it on the cached item,
+            # so repeat requests skip re-parsing the rule text
+            tz_key = str(self.local_tz)
+            rule = event['rules'].get(tz_key)
+            if rule is None:
+                rule = rrulestr(event['rrule'], dtstart=start_dt_for_rrule)
+                event['rules'][tz_key] = rule
+
+            # rrule walks every occurrence from dtstart, so for an open-ended daily
+            # series that started long ago, restart it just before the window on
+            # an occurrence that keeps the interval aligned
+            interval = event['daily_interval']
+            if interval:
+                skip = (search_start - start_dt_for_rrule).days // interval - 1
+                if skip > 0:
+                    rule = rule.replace(dtstart=start_dt_for_rrule + timedelta(days=skip * interval))
+
+            # get occurrences
+            occurrences = rule.between(search_start, search_end, inc=True)
 
         except Exception as e:
-            pass
+            # fall back to single event
+            single_event = self._parse_event(event, start_date, end_date)
+            return [single_event] if single_event else []
+
+        for occurrence in occurrences:
+            # for all-day events, convert occurrences back to dates
+            if is_all_day:
+                occurrence = occurrence.date()
+                event_date = occurrence
+            else:
+                event_date = occurrence.date()
+
+            # skip if outside our actual date range
+            if not (start_date <= event_date <= end_date):
+                continue
 
-        return recurring_events
\ No newline at end of file
+            end_time = None
+            if duration:
+                # for date objects, duration is in whole days
+                try:
+                    end_time = occurrence + duration
+                except OverflowError:
+                    continue
+
+            recurring_events.append({
+                'start': occurrence,
+                'end': end_time,
+                'title': event['title'],
+                'date': event_date.isoformat()
+            })
+
+        return recurring_events
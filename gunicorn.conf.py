@@ -0,0 +1,15 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app`
+#
+# Generating a planner mostly waits on calendar feeds, and each client keeps a
+# /progress stream open while it does. gevent workers monkey-patch sockets so
+# outbound feed requests and open streams are all scheduled cooperatively,
+# instead of each one tying up an OS thread. Greenlets only switch while
+# waiting on I/O, so the CPU-bound steps (feed parsing, PDF rendering) are
+# handed to gevent's OS thread pool (see offload.py) rather than run inline.
+bind = '0.0.0.0:5000'
+# a single process: background jobs and their finished PDFs live in memory, so
+# /progress and /download must reach the process that ran /generate
+workers = 1
+worker_class = 'gevent'
+worker_connections = 100
+timeout = 120
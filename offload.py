@@ -0,0 +1,16 @@
+import sys
+
+
+def run_cpu_bound(func, *args):
+    """Run a CPU-bound call without stalling the server.
+
+    Under gevent (the gunicorn worker, or `python wsgi.py`) threads are
+    greenlets, so a long parse or render would block every other client until
+    it finished. There the call goes to gevent's pool of real OS threads and
+    only the calling greenlet waits. Anywhere else it just runs inline.
+    """
+    if 'gevent' in sys.modules:
+        from gevent import get_hub, monkey
+        if monkey.is_module_patched('threading'):
+            return get_hub().threadpool.apply(func, args)
+    return func(*args)
@@ -2,7 +2,40 @@ from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
 from reportlab.lib.colors import black, grey, HexColor, lightgrey
 from reportlab.lib.pagesizes import letter
-from datetime import datetime, timedelta, date
+from reportlab.pdfbase import pdfmetrics
+from datetime import datetime, timedelta
+from collections import defaultdict, namedtuple
+from functools import lru_cache
+from itertools import groupby
+from operator import itemgetter
+
+# Events as the drawing code sees them; flags are worked out once in generate_pdf
+Event = namedtuple('Event', 'date start end title is_all_day has_end_dt')
+
+# Event box colors, built once rather than on every draw
+DARK_GREY = HexColor('#4A4A4A')
+WHITE = HexColor('#FFFFFF')
+
+@lru_cache(maxsize=4096)
+def _str_w(text):
+    """Width in points of event text (Helvetica-Bold 8); titles repeat a lot, so cache it"""
+    return pdfmetrics.stringWidth(text, "Helvetica-Bold", 8)
+
+@lru_cache(maxsize=256)
+def _text_layout(box_height, duration_minutes):
+    """Return (max_lines, line_height) for an event box; heights come in
+    15-minute steps, so only a handful of combinations ever occur"""
+    line_height = 9  # Height per line of text (reduced for better fit)
+    padding = 3  # Vertical padding (reduced)
+    available_height = box_height - (2 * padding)
+    max_lines = max(1, int(available_height / line_height))
+
+    # For 1-hour blocks, ensure we can show at least 2 lines
+    if duration_minutes >= 60 and max_lines < 2:
+        max_lines = 2
+        line_height = available_height / 2  # Adjust line height to fit
+
+    return max_lines, line_height
 
 class PDFGenerator:
     def __init__(self):
@@ -19,11 +52,28 @@ class PDFGenerator:
         # Content area
         self.content_width = self.page_width - (2 * self.margin)
         self.content_height = self.page_height - (2 * self.margin)
+        self._right_margin_x = self.page_width - self.margin
 
-    def generate_pdf(self, start_date, end_date, events, output_path, start_hour=6, end_hour=17, show_todos=True):
-        """Generate PDF with one page per day for the specified date range"""
+        # Hour labels (without :00), indexed by hour of day
+        self._hour_labels = []
+        for hour in range(24):
+            if hour < 12:
+                self._hour_labels.append(f"{hour} AM" if hour > 0 else "12 AM")
+            elif hour == 12:
+                self._hour_labels.append("12 PM")
+            else:
+                self._hour_labels.append(f"{hour-12} PM")
+
+    def generate_pdf(self, start_date, end_date, events, output, start_hour=6, end_hour=17, show_todos=True):
+        """Generate PDF with one page per day for the specified date range.
 
-        c = canvas.Canvas(output_path, pagesize=(self.page_width, self.page_height))
+        output can be a file path or a writable binary file-like object (e.g. BytesIO,
+        a socket file or an upload stream). A file-like object is written to directly,
+        with no temporary file, and is left open for the caller.
+        """
+
+        # always compress page streams, whatever the local reportlab config says
+        c = canvas.Canvas(output, pagesize=(self.page_width, self.page_height), pageCompression=1)
         # Ensure no page borders
         c.setStrokeColor(black)
         c.setLineWidth(0)
@@ -31,11 +81,20 @@ class PDFGenerator:
         # Calculate number of days
         total_days = (end_date - start_date).days + 1  # +1 to make it inclusive
 
+        # Group events by date once instead of scanning the full list for every day,
+        # and work out each event's kind here so drawing doesn't repeat the type checks
+        events_by_date = defaultdict(list)
+        for e in events:
+            events_by_date[e['date']].append(Event(
+                e['date'], e['start'], e['end'], e['title'],
+                not isinstance(e['start'], datetime),  # date, not datetime
+                isinstance(e['end'], datetime)
+            ))
+
         for day_offset in range(total_days):
             current_date = start_date + timedelta(days=day_offset)
-            date_str = current_date.strftime('%Y-%m-%d')
-            day_events = [e for e in events if e['date'] == date_str]
-
+            date_str = current_date.isoformat()  # same key format the fetcher writes
+            day_events = events_by_date.get(date_str, [])
 
             self.draw_daily_page(c, current_date, day_events, start_hour, end_hour, show_todos)
             if day_offset < total_days - 1:  # Don't add page after last day
@@ -51,91 +110,117 @@ class PDFGenerator:
         # Draw date header (right-aligned, smaller font)
         c.setFont("Helvetica-Bold", 12)
         date_text = current_date.strftime('%A, %B %d, %Y')
-        text_width = c.stringWidth(date_text, "Helvetica-Bold", 12)
-        c.drawString(self.page_width - self.margin - text_width, y_pos, date_text)
+        text_width = pdfmetrics.stringWidth(date_text, "Helvetica-Bold", 12)
+        c.drawString(self._right_margin_x - text_width, y_pos, date_text)
         y_pos -= 12
 
-        # Calculate total rows (time slots + all-day if present)
-        time_slots = (end_hour + 1) - start_hour
-        total_rows = time_slots + (1 if len([e for e in events if isinstance(e['start'], date) and not isinstance(e['start'], datetime)]) > 0 else 0)
+        # Calculate dimensions with more space per hour
+        hour_height = 26  # points per hour (increased for better spacing)
+        time_column_width = 50  # Time column width
+        event_column_start = self.margin + time_column_width - 10  # Add small padding after time
+        event_column_width = (self.content_width - time_column_width - 6) * 0.5  # 50% for events, 50% for notes
+
+        # Check for all-day events (those with date objects, not datetime)
+        all_day_events = [e for e in events if e.is_all_day]
+        has_all_day = len(all_day_events) > 0
+
+        # The grid (lines, time labels, to-do section) only depends on the layout
+        # options, so it's drawn once per document as a form and reused by each page
+        form_name = f"grid_{start_hour}_{end_hour}_{int(has_all_day)}_{int(show_todos)}"
+        if not c.hasForm(form_name):
+            c.beginForm(form_name)
+            self._draw_grid(c, start_hour, end_hour, has_all_day, show_todos, hour_height, event_column_start)
+            c.endForm()
+        c.doForm(form_name)
+
+        # Draw all-day events in their row, between the header and the first hour
+        if all_day_events:
+            all_day_box_y = y_pos - 8.5 - hour_height  # Full hour height for all-day section
+            self._draw_all_day_events(c, all_day_events, event_column_start, event_column_width, all_day_box_y, hour_height)
+
+        # Draw events (pass whether we have all-day events to adjust positioning)
+        self._draw_events(c, current_date, events, event_column_start, event_column_width, hour_height, start_hour, end_hour, has_all_day)
+
+    def _draw_grid(self, c, start_hour, end_hour, has_all_day, show_todos, hour_height, event_column_start):
+        """Draw the static part of a day page: divider lines, time labels and to-do section"""
+        # Starting position (just below the date header)
+        y_pos = self.page_height - self.margin - 12
 
         # Draw faint horizontal line under header (very close to header)
         c.setStrokeColor(lightgrey)
         c.setLineWidth(0.5)
-        c.line(self.margin, y_pos, self.page_width - self.margin, y_pos)
+        c.line(self.margin, y_pos, self._right_margin_x, y_pos)
         c.setStrokeColor(black)  # Reset
 
         # Consistent header spacing for predictable layout
         y_pos -= 8.5
 
-        # Calculate dimensions with more space per hour
-        hour_height = 26  # points per hour (increased for better spacing)
         half_hour_height = hour_height / 2
-        time_column_width = 50  # Time column width
-        event_column_start = self.margin + time_column_width - 10  # Add small padding after time
-        event_column_width = (self.content_width - time_column_width - 6) * 0.5  # 50% for events, 50% for notes
+        time_slots = (end_hour + 1) - start_hour
 
         # Track the bottom of the schedule section
         schedule_bottom = y_pos
 
-        # Check for all-day events (those with date objects, not datetime)
-        all_day_events = [e for e in events if isinstance(e['start'], date) and not isinstance(e['start'], datetime)]
-        has_all_day = len(all_day_events) > 0
-
-        # Draw all-day slot if there are all-day events
-        if all_day_events:
-            # Draw "ALL DAY" time label
-            c.setFont("Helvetica-Bold", 9)
-            c.setFillColor(black)
-            c.drawString(self.margin, y_pos - 12, "All Day")
+        # Collect line positions and labels, then draw each kind in one pass
+        hour_ys = []
+        half_hour_ys = []
+        labels = []
 
-            # Draw all-day events in their row
-            all_day_box_y = y_pos - hour_height  # Full hour height for all-day section
-            self._draw_all_day_events(c, all_day_events, event_column_start, event_column_width, all_day_box_y, hour_height)
+        # All-day slot if there are all-day events
+        if has_all_day:
+            # "ALL DAY" time label
+            labels.append((y_pos - 12, "All Day"))
 
-            # Draw hour line after all-day section
-            c.setStrokeColor(grey)
-            c.setLineWidth(0.5)
+            # Hour line after all-day section
             y_pos -= hour_height
-            c.line(self.margin, y_pos, self.page_width - self.margin, y_pos)
+            hour_ys.append(y_pos)
 
             # Update schedule bottom position
             schedule_bottom = y_pos
 
-        # Draw hourly time slots (start_hour through end_hour, inclusive)
+        # Hourly time slots (start_hour through end_hour, inclusive)
         for hour in range(start_hour, end_hour + 1):
-            # Format time (without :00)
-            if hour < 12:
-                time_str = f"{hour} AM" if hour > 0 else "12 AM"
-            elif hour == 12:
-                time_str = "12 PM"
-            else:
-                time_str = f"{hour-12} PM"
-
-            # Draw time label with bold font and more padding above
-            c.setFont("Helvetica-Bold", 9)
-            c.setFillColor(black)
-            c.drawString(self.margin, y_pos - 12, time_str)  # More padding from divider line
-
-            # Draw half-hour line (faint)
-            c.setStrokeColor(lightgrey)
-            c.setLineWidth(0.25)
-            half_hour_y = y_pos - half_hour_height
-            c.line(event_column_start, half_hour_y, self.page_width - self.margin, half_hour_y)
-
-            # Draw hour line
-            c.setStrokeColor(grey)
-            c.setLineWidth(0.5)
+            # Time label with more padding from divider line
+            labels.append((y_pos - 12, self._hour_labels[hour]))
+
+            # Half-hour line (faint)
+            half_hour_ys.append(y_pos - half_hour_height)
+
+            # Hour line
             y_pos -= hour_height
-            c.line(self.margin, y_pos, self.page_width - self.margin, y_pos)
+            hour_ys.append(y_pos)
 
             # Update schedule bottom position
             schedule_bottom = y_pos
 
             # Keep consistent hour height - let to-do section handle space constraints
 
-        # Draw events (pass whether we have all-day events to adjust positioning)
-        self._draw_events(c, current_date, events, event_column_start, event_column_width, hour_height, start_hour, end_hour, has_all_day)
+        # Draw all half-hour lines as a single path
+        path = c.beginPath()
+        for y in half_hour_ys:
+            path.moveTo(event_column_start, y)
+            path.lineTo(self._right_margin_x, y)
+        c.setStrokeColor(lightgrey)
+        c.setLineWidth(0.25)
+        c.drawPath(path, stroke=1, fill=0)
+
+        # Draw all hour lines as a single path
+        path = c.beginPath()
+        for y in hour_ys:
+            path.moveTo(self.margin, y)
+            path.lineTo(self._right_margin_x, y)
+        c.setStrokeColor(grey)
+        c.setLineWidth(0.5)
+        c.drawPath(path, stroke=1, fill=0)
+
+        # Draw time labels with bold font, all in one text object
+        text = c.beginText()
+        text.setFillColor(black)
+        text.setFont("Helvetica-Bold", 9)
+        for y, label in labels:
+            text.setTextOrigin(self.margin, y)
+            text.textOut(label)
+        c.drawText(text)
 
         # Draw to-do list section at the bottom (only if show_todos is True)
         if show_todos:
@@ -160,13 +245,16 @@ class PDFGenerator:
         if has_all_day:
             grid_top -= hour_height
 
-        # Group events by time slot to handle overlaps
-        time_slots = {}
+        # Top of each hour slot's event boxes, indexed from start_hour
+        hour_y = [grid_top - (hour - start_hour) * hour_height - 1 for hour in range(start_hour, end_hour + 1)]
 
-        # First pass: group events by hour
+        # Collect (slot hour, event) pairs for the events shown on the grid
+        timed = []
+
+        # First pass: filter events and pick each one's hour slot
         for event in events:
             # Skip all-day events (those with date objects, not datetime)
-            if not isinstance(event['start'], datetime):
+            if event.is_all_day:
                 continue  # Skip all-day events
 
             # Check if event overlaps with our displayed time window
@@ -174,50 +262,55 @@ class PDFGenerator:
             window_end = end_hour + 1  # End of the last hour slot
 
             # Event must start before the end of our window
-            if event['start'].hour >= window_end:
+            if event.start.hour >= window_end:
                 continue
 
             # Event must end after the start of our window (or have no end time)
-            if event['end'] and isinstance(event['end'], datetime):
+            if event.has_end_dt:
                 # Check if event ends before our window starts
-                event_end_hour = event['end'].hour
-                if event['end'].minute > 0:
+                event_end_hour = event.end.hour
+                if event.end.minute > 0:
                     event_end_hour += 1  # Round up if there are minutes
                 if event_end_hour <= start_hour:
                     continue
             # If no end time, include it if it starts within or before our window
 
             # Use the event's start hour for grouping (capped at end_hour for events starting after)
-            event_hour = min(event['start'].hour, end_hour)
+            event_hour = min(event.start.hour, end_hour)
             if event_hour < start_hour:
                 event_hour = start_hour  # Group early events with the first hour
 
-            if event_hour not in time_slots:
-                time_slots[event_hour] = []
-            time_slots[event_hour].append(event)
+            timed.append((event_hour, event))
+
+        # Group events by time slot to handle overlaps; the sort is stable, so
+        # events keep their incoming order within an hour
+        timed.sort(key=itemgetter(0))
 
-        # Second pass: draw events, handling overlaps
-        for hour, hour_events in time_slots.items():
+        # Second pass: lay out events, handling overlaps
+        boxes = []
+        for hour, group in groupby(timed, key=itemgetter(0)):
+            hour_events = [event for _, event in group]
             for i, event in enumerate(hour_events):
+                start, end = event.start, event.end
+
                 # Calculate base position
-                event_minute = event['start'].minute
-                hours_from_start = hour - start_hour + (event_minute / 60.0)
-                event_top = grid_top - (hours_from_start * hour_height) - 1
+                event_minute = start.minute
+                event_top = hour_y[hour - start_hour] - (event_minute * hour_height / 60.0)
 
                 # Calculate duration and height
                 duration_minutes = 60  # Default 1 hour
-                if event['end'] and isinstance(event['end'], datetime):
+                if event.has_end_dt:
                     # Calculate actual duration
-                    delta = event['end'] - event['start']
+                    delta = end - start
                     duration_minutes = delta.total_seconds() / 60
 
                     # Clip at end_hour + 1:15 (15 minutes past the end of the last hour slot)
                     # e.g., if end_hour is 15 (3pm), we show the 3-4pm slot, clip at 4:15pm
                     from datetime import time, timedelta
-                    clip_time = event['start'].replace(hour=end_hour + 1, minute=15, second=0, microsecond=0)
-                    if event['end'] > clip_time:
+                    clip_time = start.replace(hour=end_hour + 1, minute=15, second=0, microsecond=0)
+                    if end > clip_time:
                         # Event extends past clip time, cut it off
-                        minutes_to_clip = (clip_time - event['start']).total_seconds() / 60
+                        minutes_to_clip = (clip_time - start).total_seconds() / 60
                         duration_minutes = min(duration_minutes, minutes_to_clip)
 
                 # Round to 15-minute increments
@@ -245,33 +338,20 @@ class PDFGenerator:
                     event_width = notes_section_width / events_in_notes
                     event_x = notes_section_start + ((i - 1) * event_width)
 
-                # Draw rounded rectangle with dark grey background
-                self._draw_rounded_rect(c, event_x, box_y, event_width, box_height, radius=2)
-
-                # Draw event text in white with bold font
-                c.setFillColor(HexColor('#FFFFFF'))
-                c.setFont("Helvetica-Bold", 8)
+                text_runs = []
+                boxes.append((event_x, box_y, event_width, box_height, text_runs))
 
                 # Calculate how many lines we can fit
-                line_height = 9  # Height per line of text (reduced for better fit)
-                padding = 3  # Vertical padding (reduced)
-                available_height = box_height - (2 * padding)
-                max_lines = max(1, int(available_height / line_height))
-
-                # For 1-hour blocks, ensure we can show at least 2 lines
-                if duration_minutes >= 60 and max_lines < 2:
-                    max_lines = 2
-                    line_height = available_height / 2  # Adjust line height to fit
+                max_lines, line_height = _text_layout(box_height, duration_minutes)
 
-                # Calculate character width for wrapping (adjust for narrower width if multiple events)
-                char_width = 4  # Approximate character width for font size 8
-                max_chars_per_line = int((event_width - 10) / char_width)  # 10 = horizontal padding
+                # Text width available for wrapping (narrower if multiple events)
+                max_text_width = event_width - 10  # 10 = horizontal padding
 
                 # Wrap text to fit
-                event_text = event['title']
-                lines = self._wrap_text(event_text, max_chars_per_line, max_lines)
+                event_text = event.title
+                lines = self._wrap_text(event_text, max_text_width, max_lines)
 
-                # Draw each line
+                # Position each line
                 for j, line in enumerate(lines):
                     if j >= max_lines:
                         break
@@ -286,13 +366,13 @@ class PDFGenerator:
                         start_y = box_y + (box_height - total_text_height) / 2 + (len(lines) - 1) * line_height
                         text_y = start_y - (j * line_height)
 
-                    c.drawString(event_x + 5, text_y, line)
+                    text_runs.append((event_x + 5, text_y, line))
 
-                # Reset color
-                c.setFillColor(black)
+        self._draw_event_boxes(c, boxes)
 
     def _draw_all_day_events(self, c, all_day_events, x_start, width, y_bottom, row_height):
         """Draw all-day events in the all-day section"""
+        boxes = []
         for i, event in enumerate(all_day_events):
             # Calculate position - first event in event section, others in notes section
             event_width = width
@@ -312,26 +392,21 @@ class PDFGenerator:
             box_height = row_height - 6  # Leave some spacing
             box_y = y_bottom + 3  # Small padding from bottom line
 
-            # Draw rounded rectangle with dark grey background
-            self._draw_rounded_rect(c, event_x, box_y, event_width, box_height, radius=2)
+            text_runs = []
+            boxes.append((event_x, box_y, event_width, box_height, text_runs))
 
-            # Draw event text in white with bold font
-            c.setFillColor(HexColor('#FFFFFF'))
-            c.setFont("Helvetica-Bold", 8)
-
-            # Calculate character width for wrapping
-            char_width = 4  # Approximate character width for font size 8
-            max_chars_per_line = int((event_width - 10) / char_width)  # 10 = horizontal padding
+            # Text width available for wrapping
+            max_text_width = event_width - 10  # 10 = horizontal padding
 
             # For all-day events, try to fit in one line, but allow two if needed
             max_lines = 2
             line_height = 9
 
             # Wrap text to fit
-            event_text = event['title']
-            lines = self._wrap_text(event_text, max_chars_per_line, max_lines)
+            event_text = event.title
+            lines = self._wrap_text(event_text, max_text_width, max_lines)
 
-            # Draw each line
+            # Position each line
             for j, line in enumerate(lines):
                 if j >= max_lines:
                     break
@@ -346,22 +421,37 @@ class PDFGenerator:
                     start_y = box_y + (box_height - total_text_height) / 2 + (len(lines) - 1) * line_height
                     text_y = start_y - (j * line_height)
 
-                c.drawString(event_x + 5, text_y, line)
+                text_runs.append((event_x + 5, text_y, line))
 
-            # Reset color
-            c.setFillColor(black)
+        self._draw_event_boxes(c, boxes)
 
-    def _draw_rounded_rect(self, c, x, y, width, height, radius=3):
-        """Draw a rounded rectangle"""
-        c.setFillColor(HexColor('#4A4A4A'))  # Dark grey
-        c.setStrokeColor(HexColor('#4A4A4A'))
+    def _draw_event_boxes(self, c, boxes):
+        """Draw event boxes as dark grey rounded rectangles with white bold text.
 
-        # Draw the rounded rectangle path
-        c.roundRect(x, y, width, height, radius, fill=1, stroke=1)
+        boxes holds (x, y, width, height, text_runs) tuples. Each box is followed by
+        its own text object, so a box that overlaps an earlier one covers that
+        label instead of mixing with it.
+        """
+        c.saveState()
 
-        # Reset colors
-        c.setFillColor(black)
-        c.setStrokeColor(black)
+        for x, y, width, height, text_runs in boxes:
+            # Rounded rectangle with dark grey background. Fill only, grown by
+            # the 0.25pt a same-colored 0.5pt outline used to add on each side.
+            # Fill color is graphics state, so the previous label's white persists
+            # past its text object and has to be reset for every box
+            c.setFillColor(DARK_GREY)
+            c.roundRect(x - 0.25, y - 0.25, width + 0.5, height + 0.5, 2.25, fill=1, stroke=0)
+
+            # Event text in white with bold font, one text object per box
+            text = c.beginText()
+            text.setFillColor(WHITE)
+            text.setFont("Helvetica-Bold", 8)
+            for text_x, text_y, line in text_runs:
+                text.setTextOrigin(text_x, text_y)
+                text.textOut(line)
+            c.drawText(text)
+
+        c.restoreState()
 
     def _draw_todo_section(self, c, y_start, num_todos=4, height_multiplier=1.0):
         """Draw to-do list section with checkboxes"""
@@ -378,26 +468,29 @@ class PDFGenerator:
         available_space = base_available_space * height_multiplier  # Apply compression if needed
         line_height = available_space / num_todos  # Divide space evenly among to-do items
 
+        # Collect all checkboxes and text lines into one path each
+        boxes = c.beginPath()
+        lines = c.beginPath()
+        line_start = self.margin + checkbox_size + 6
         for i in range(num_todos):
-            # Draw checkbox
-            c.setLineWidth(0.5)
-            c.setStrokeColor(black)
-            c.rect(self.margin, y_pos - checkbox_size, checkbox_size, checkbox_size)
-
-            # Draw line for text (aligned with bottom of checkbox)
-            line_start = self.margin + checkbox_size + 6
-            c.setLineWidth(0.3)
-            c.setStrokeColor(black)
+            # Checkbox
+            boxes.rect(self.margin, y_pos - checkbox_size, checkbox_size, checkbox_size)
+
+            # Line for text (aligned with bottom of checkbox)
             line_y = y_pos - checkbox_size  # Bottom of checkbox
-            c.line(line_start, line_y, self.page_width - self.margin, line_y)
+            lines.moveTo(line_start, line_y)
+            lines.lineTo(self._right_margin_x, line_y)
 
             y_pos -= line_height
 
-        # Reset colors
         c.setStrokeColor(black)
+        c.setLineWidth(0.5)
+        c.drawPath(boxes, stroke=1, fill=0)
+        c.setLineWidth(0.3)
+        c.drawPath(lines, stroke=1, fill=0)
 
-    def _wrap_text(self, text, max_chars_per_line, max_lines):
-        """Wrap text to fit within specified constraints"""
+    def _wrap_text(self, text, max_width_pt, max_lines):
+        """Wrap text to fit within specified constraints, measuring real glyph widths"""
         if not text:
             return [""]
 
@@ -406,31 +499,44 @@ class PDFGenerator:
         current_line = ""
 
         for word in words:
-            # If adding this word would exceed the line length
-            if len(current_line + " " + word) > max_chars_per_line:
+            candidate = (current_line + " " + word) if current_line else word
+            # If adding this word would exceed the line width
+            if _str_w(candidate) > max_width_pt:
                 if current_line:
-                    lines.append(current_line.strip())
+                    lines.append(current_line)
                     current_line = word
+                    if _str_w(word) > max_width_pt and len(lines) < max_lines:
+                        # Word alone is too wide for the next line too, truncate it
+                        lines.append(self._truncate(word, max_width_pt))
+                        current_line = ""
                 else:
                     # Single word is too long, truncate it
-                    lines.append(word[:max_chars_per_line - 3] + "...")
+                    lines.append(self._truncate(word, max_width_pt))
                     current_line = ""
 
                 # Stop if we've reached max lines
                 if len(lines) >= max_lines:
                     break
             else:
-                current_line += (" " + word) if current_line else word
+                current_line = candidate
 
         # Add the last line if there's content and we haven't exceeded max lines
         if current_line and len(lines) < max_lines:
-            lines.append(current_line.strip())
+            lines.append(current_line)
 
         # If we had to truncate due to max lines, add ellipsis to last line
         if len(lines) == max_lines and len(words) > len(" ".join(lines).split()):
-            if lines:
-                last_line = lines[-1]
-                if len(last_line) > 3:
-                    lines[-1] = last_line[:-3] + "..."
-
-        return lines if lines else [""]
\ No newline at end of file
+            if lines and not lines[-1].endswith("..."):
+                lines[-1] = self._truncate(lines[-1] + "...", max_width_pt)
+
+        return lines if lines else [""]
+
+    def _truncate(self, text, max_width_pt):
+        """Shorten text with a trailing ellipsis until it fits max_width_pt"""
+        if _str_w(text) <= max_width_pt:
+            return text
+        if text.endswith("..."):
+            text = text[:-3]
+        while text and _str_w(text + "...") > max_width_pt:
+            text = text[:-1]
+        return text.rstrip() + "..."
@@ -0,0 +1,14 @@
+# Standalone gevent server: `python wsgi.py`
+#
+# Patching the standard library first makes requests' sockets (and the
+# fetcher's worker threads) cooperative, so many /generate calls can wait on
+# calendar feeds at once in a single process. Must run before anything else
+# imports socket or threading.
+from gevent import monkey
+monkey.patch_all()
+
+from gevent.pywsgi import WSGIServer
+from app import app
+
+if __name__ == '__main__':
+    WSGIServer(('0.0.0.0', 5000), app).serve_forever()